@@ -6,10 +6,10 @@ from src.IntradayDataHandler import IntradayDataHandler
 import pandas as pd
 import yfinance as yf
 import json
+from concurrent.futures import ThreadPoolExecutor
 
 
-# Example Usage
-if __name__ == "__main__":
+def main():
     # read json file that contains the tickers
     with open("ticker.json", "r") as f:
         ticker_dict = json.load(f)
@@ -17,13 +17,23 @@ if __name__ == "__main__":
     tickers = []
     for key in ticker_dict:
         tickers.extend(ticker_dict[key])
-    
+
     base_folder = "all_ohclv_data"
     handler = DailyDataHandler(tickers, base_folder)
-    handler.update_all()
-    
-    intradayHandler = IntradayDataHandler(tickers, base_folder)  
-    intradayHandler.update_all()
+    intradayHandler = IntradayDataHandler(tickers, base_folder)
+
+    # The two pipelines touch disjoint files and are network-bound on
+    # yfinance, so run them side by side instead of back to back
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        daily_future = executor.submit(handler.update_all)
+        intraday_future = executor.submit(intradayHandler.update_all)
+        daily_future.result()
+        intraday_future.result()
+
+
+# Example Usage
+if __name__ == "__main__":
+    main()
 
 
 
@@ -12,14 +12,15 @@ Designed to run via cron job on weekends
 
 import os
 import sys
-import subprocess
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+# Load environment variables; the explicit path skips find_dotenv's
+# stat-per-level walk up the parent directories
+load_dotenv(Path(__file__).parent / ".env")
 
 # Configure logging
 log_dir = Path("logs")
@@ -37,61 +38,56 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Built once instead of re-allocating "=" * 60 at every step boundary
+BANNER = "=" * 60
+
+
+def _log_step(name):
+    """Log the three-line step banner in one call"""
+    logger.info(BANNER)
+    logger.info(name)
+    logger.info(BANNER)
+
 
 class DataCollectionService:
     """Main service class that orchestrates the complete data collection workflow"""
     
     def __init__(self):
         self.project_root = Path(__file__).parent.absolute()
-        self.python_exe = sys.executable
-        
+
+        # Make the stage modules importable regardless of cwd
+        sys.path.insert(0, str(self.project_root))
+        sys.path.insert(0, str(self.project_root / "src"))
+
         # Configuration flags
         self.enable_local_db = os.getenv("ENABLE_LOCAL_DB", "false").lower() == "true"
         self.enable_bigquery = os.getenv("ENABLE_BIGQUERY", "false").lower() == "true"
         self.enable_quality_checks = os.getenv("ENABLE_QUALITY_CHECKS", "true").lower() == "true"
-    
-    def run_script(self, script_path, description):
-        """Run a Python script and return success status"""
-        logger.info(f"Running: {description}")
-        logger.info(f"Script: {script_path}")
-        
+
+    def run_stage(self, fn, description):
+        """Run a stage entrypoint in-process and return success status"""
+        # Calling the stage's main() directly avoids a subprocess per stage:
+        # no interpreter startup, no re-import of pandas/pyarrow/yfinance,
+        # and stage output flows through the configured logger
+        logger.info("Running: %s", description)
+
         try:
-            result = subprocess.run(
-                [self.python_exe, script_path],
-                cwd=self.project_root,
-                capture_output=True,
-                text=True,
-                timeout=3600  # 1 hour timeout
-            )
-            
-            # Log output
-            if result.stdout:
-                logger.info(f"Output:\n{result.stdout}")
-            if result.stderr:
-                logger.warning(f"Errors:\n{result.stderr}")
-            
-            if result.returncode == 0:
-                logger.info(f"✓ {description} completed successfully")
-                return True
-            else:
-                logger.error(f"✗ {description} failed with return code {result.returncode}")
-                return False
-                
-        except subprocess.TimeoutExpired:
-            logger.error(f"✗ {description} timed out after 1 hour")
-            return False
+            fn()
+            logger.info("✓ %s completed successfully", description)
+            return True
         except Exception as e:
-            logger.error(f"✗ {description} failed: {e}", exc_info=True)
+            logger.error("✗ %s failed: %s", description, e, exc_info=True)
             return False
-    
+
     def collect_data(self):
         """Step 1: Collect data from Yahoo Finance (main.py)"""
-        logger.info("=" * 60)
-        logger.info("Step 1: Data Collection")
-        logger.info("=" * 60)
-        
-        main_script = self.project_root / "main.py"
-        return self.run_script(main_script, "Data Collection")
+        _log_step("Step 1: Data Collection")
+
+        def run_collection():
+            from main import main as collect_main
+            collect_main()
+
+        return self.run_stage(run_collection, "Data Collection")
     
     def run_quality_checks(self):
         """Step 2: Run data quality monitoring (data_quality_monitor.py)"""
@@ -99,24 +95,18 @@ class DataCollectionService:
             logger.info("Skipping quality checks (disabled)")
             return True
         
-        logger.info("=" * 60)
-        logger.info("Step 2: Data Quality Monitoring")
-        logger.info("=" * 60)
+        _log_step("Step 2: Data Quality Monitoring")
         
-        # Import and run quality monitor
-        try:
-            sys.path.insert(0, str(self.project_root / "src"))
+        def run_monitor():
             from data_quality_monitor import DataQualityMonitor
-            
-            monitor = DataQualityMonitor()
-            monitor.run_checks()
-            logger.info("✓ Data Quality Monitoring completed successfully")
-            return True
-        except Exception as e:
-            logger.error(f"✗ Data Quality Monitoring failed: {e}", exc_info=True)
-            # Don't fail the pipeline on quality check errors
+            DataQualityMonitor().run_checks()
+
+        success = self.run_stage(run_monitor, "Data Quality Monitoring")
+
+        # Don't fail the pipeline on quality check errors
+        if not success:
             logger.warning("Continuing pipeline despite quality check issues")
-            return True
+        return True
     
     def upload_to_bigquery(self):
         """Step 3: Upload to BigQuery (combine_transf_csv_for_upload.py)"""
@@ -124,12 +114,13 @@ class DataCollectionService:
             logger.info("Skipping BigQuery upload (disabled)")
             return True
         
-        logger.info("=" * 60)
-        logger.info("Step 3: BigQuery Upload")
-        logger.info("=" * 60)
+        _log_step("Step 3: BigQuery Upload")
         
-        bq_script = self.project_root / "src" / "combine_transf_csv_for_upload.py"
-        success = self.run_script(bq_script, "BigQuery Upload")
+        def run_bq_upload():
+            from combine_transf_csv_for_upload import main as bq_main
+            bq_main()
+
+        success = self.run_stage(run_bq_upload, "BigQuery Upload")
         
         # Don't fail the pipeline on BigQuery errors
         if not success:
@@ -142,12 +133,13 @@ class DataCollectionService:
             logger.info("Skipping local DB upload (disabled)")
             return True
         
-        logger.info("=" * 60)
-        logger.info("Step 4: Local Database Upload")
-        logger.info("=" * 60)
+        _log_step("Step 4: Local Database Upload")
         
-        local_db_script = self.project_root / "src" / "backfill_combined_csv_local.py"
-        success = self.run_script(local_db_script, "Local DB Upload")
+        def run_local_upload():
+            from backfill_combined_csv_local import main as local_main
+            local_main()
+
+        success = self.run_stage(run_local_upload, "Local DB Upload")
         
         # Don't fail the pipeline on local DB errors
         if not success:
@@ -156,10 +148,10 @@ class DataCollectionService:
     
     def run(self):
         """Run the complete workflow in order"""
-        logger.info("=" * 60)
+        logger.info(BANNER)
         logger.info("Yahoo Finance Data Collection Service")
-        logger.info(f"Started at: {datetime.now()}")
-        logger.info("=" * 60)
+        logger.info("Started at: %s", datetime.now())
+        logger.info(BANNER)
         
         results = {
             "data_collection": False,
@@ -174,32 +166,33 @@ class DataCollectionService:
             logger.error("Data collection failed, aborting workflow")
             return False
         
-        # Step 2: Quality checks (data_quality_monitor.py)
-        results["quality_checks"] = self.run_quality_checks()
-        
-        # Step 3: Upload to BigQuery (combine_transf_csv_for_upload.py)
-        results["bigquery_upload"] = self.upload_to_bigquery()
-        
-        # Step 4: Upload to local DB (backfill_combined_csv_local.py)
-        results["local_db_upload"] = self.upload_to_local_db()
+        # Steps 2-4 only read the transf stores written by step 1 and are
+        # independent of each other, so run them side by side: quality
+        # checks (CPU), BigQuery upload and local DB upload (network)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            quality_future = executor.submit(self.run_quality_checks)
+            bigquery_future = executor.submit(self.upload_to_bigquery)
+            local_db_future = executor.submit(self.upload_to_local_db)
+
+            results["quality_checks"] = quality_future.result()
+            results["bigquery_upload"] = bigquery_future.result()
+            results["local_db_upload"] = local_db_future.result()
         
         # Summary
-        logger.info("=" * 60)
-        logger.info("Workflow Summary")
-        logger.info("=" * 60)
+        _log_step("Workflow Summary")
         for step, success in results.items():
             status = "✓" if success else "✗"
-            logger.info(f"{status} {step.replace('_', ' ').title()}")
+            logger.info("%s %s", status, step.replace("_", " ").title())
         
         # Consider workflow successful if data collection succeeded
         # (uploads are non-critical)
         workflow_success = results["data_collection"]
         
         if workflow_success:
-            logger.info("=" * 60)
+            logger.info(BANNER)
             logger.info("Workflow completed!")
-            logger.info(f"Completed at: {datetime.now()}")
-            logger.info("=" * 60)
+            logger.info("Completed at: %s", datetime.now())
+            logger.info(BANNER)
         else:
             logger.error("Workflow failed (see logs above)")
         
@@ -216,7 +209,7 @@ def main():
         logger.info("Service interrupted by user")
         sys.exit(130)
     except Exception as e:
-        logger.error(f"Fatal error: {e}", exc_info=True)
+        logger.error("Fatal error: %s", e, exc_info=True)
         sys.exit(1)
 
 
@@ -1,9 +1,54 @@
 import os
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
 import yfinance as yf
 from datetime import datetime, timezone
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import logging
 import json
+
+try:
+    from src.scan_utils import scan_files
+    from src.download_utils import download_with_retry
+except ImportError:
+    from scan_utils import scan_files
+    from download_utils import download_with_retry
+
+try:
+    from requests import Session
+    from requests_cache import CacheMixin, SQLiteCache
+    from requests_ratelimiter import LimiterMixin
+
+    class CachedLimiterSession(CacheMixin, LimiterMixin, Session):
+        """Requests session with a 1h response cache and rate limiting."""
+
+    SESSION_AVAILABLE = True
+except ImportError:
+    SESSION_AVAILABLE = False
+
+# Lazy module-level session: kept off the handler instance so the
+# ProcessPoolExecutor stages can still pickle self
+_session = None
+_session_warned = False
+
+
+def _get_session(base_folder):
+    global _session, _session_warned
+    if not SESSION_AVAILABLE:
+        if not _session_warned:
+            logging.warning("⚠️ requests-cache/requests-ratelimiter not available, downloads run without the shared cached session")
+            _session_warned = True
+        return None
+    if _session is None:
+        _session = CachedLimiterSession(
+            per_second=2,
+            backend=SQLiteCache(os.path.join(base_folder, "yfinance.cache")),
+            expire_after=3600,
+        )
+    return _session
 """
 LOGGING being appended to daily datahandelr 
 when running main.py file
@@ -28,6 +73,17 @@ logging.basicConfig(
     ]
 )"""
 
+def _parse_datetime_utc(values):
+    # Already-typed Arrow columns pass straight through; strings from legacy
+    # CSVs hit pandas' ISO8601 C fast path instead of per-value dateutil
+    if pd.api.types.is_datetime64_any_dtype(values):
+        parsed = pd.to_datetime(values, utc=True)
+    else:
+        parsed = pd.to_datetime(values, utc=True, format='ISO8601')
+    # Series is UTC already, so dropping the tz is a localize, not a convert
+    return parsed.dt.tz_localize(None)
+
+
 class IntradayDataHandler:
     def __init__(self, tickers, base_folder):
         self.tickers = [ticker.upper() for ticker in tickers]
@@ -45,35 +101,77 @@ class IntradayDataHandler:
 
         self.intraday_timeframes = ["1m", "5m", "15m", "30m", "90m", "1h"]
 
+    @staticmethod
+    def _write_arrow(df, path):
+        # Arrow IPC with LZ4: reads come back as near-zero-copy mmap loads
+        # and the Datetime dtype survives the round trip
+        feather.write_feather(pa.Table.from_pandas(df), path, compression='lz4')
+
+    @staticmethod
+    def _read_arrow(path, columns=None):
+        return feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+    @staticmethod
+    def _migrate_csv_to_arrow(arrow_path):
+        # One-time shim: rewrite a leftover CSV as Arrow if no Arrow file exists yet
+        csv_path = arrow_path.replace('.arrow', '.csv')
+        if not os.path.exists(arrow_path) and os.path.exists(csv_path):
+            df = pd.read_csv(csv_path, parse_dates=['Datetime'], engine='pyarrow')
+            feather.write_feather(pa.Table.from_pandas(df), arrow_path, compression='lz4')
+            logging.info(f"✅ Migrated {csv_path} to Arrow.")
+
+    def _write_meta(self, path, latest):
+        # Sidecar with the latest timestamp so needs_update never has to
+        # parse the data file itself
+        with open(path + '.meta.json', 'w') as f:
+            json.dump({"latest": pd.Timestamp(latest).isoformat()}, f)
+
+    @staticmethod
+    def _read_meta_latest(path):
+        # Latest timestamp from the sidecar, or None if it is missing or
+        # older than the data file it describes
+        meta_path = path + '.meta.json'
+        try:
+            if os.path.getmtime(meta_path) >= os.path.getmtime(path):
+                with open(meta_path) as f:
+                    return pd.Timestamp(json.load(f)["latest"])
+        except (OSError, ValueError, KeyError):
+            pass
+        return None
+
+    def _timeframe_files(self, folder):
+        # All per-ticker Arrow files in a folder, after migrating leftover CSVs
+        timeframes = set(self.intraday_timeframes)
+        for path, _, _ in scan_files(folder, suffixes={'.csv'}, timeframes=timeframes):
+            self._migrate_csv_to_arrow(path[:-len('.csv')] + '.arrow')
+        return [os.path.basename(path) for path, _, _ in
+                scan_files(folder, suffixes={'.arrow'}, timeframes=timeframes)]
+
     def update_all(self):
         if self.needs_update():
-            self.fetch_intraday_data()
-            self.clean_fetched_data()
-            self.check_new_datetime()
+            # Hand the frames between stages in memory; only the raw and
+            # transf folders are written, halving the disk round-trips
+            fetched = self.fetch_intraday_data()
+            cleaned = self.clean_fetched_data(fetched)
+            self.check_new_datetime(cleaned)
         else:
             logging.info("ℹ️ No update needed.")
 
     def needs_update(self):
         now = datetime.now(timezone.utc)
 
-        for file in os.listdir(self.transf_folder):
-            if not file.endswith('.csv'):
-                continue
-
-            timeframe = file.replace('.csv', '').split('_')[-1]
-            if timeframe not in self.intraday_timeframes:
-                continue
-
+        for file in self._timeframe_files(self.transf_folder):
             path = os.path.join(self.transf_folder, file)
 
             try:
-                df = pd.read_csv(path, parse_dates=['Datetime'])
-                if df.empty:
-                    logging.warning(f"⚠️ Empty file detected: {file}, update needed.")
-                    return True
+                latest = self._read_meta_latest(path)
+                if latest is None:
+                    df = self._read_arrow(path, columns=['Datetime'])
+                    if df.empty:
+                        logging.warning(f"⚠️ Empty file detected: {file}, update needed.")
+                        return True
 
-                df['Datetime'] = pd.to_datetime(df['Datetime'], utc=True).dt.tz_convert(None)
-                latest = df['Datetime'].max()
+                    latest = _parse_datetime_utc(df['Datetime']).max()
 
                 if pd.isna(latest):
                     logging.warning(f"⚠️ No valid datetime in {file}, update needed.")
@@ -100,25 +198,55 @@ class IntradayDataHandler:
             "1h": "730d"    # Approx 2 years
         }
     
-        for ticker in self.tickers:
-            for tf in self.intraday_timeframes:
-                period = interval_to_period.get(tf, "60d")  # Default to 60d if not found
-                path = os.path.join(self.fetched_folder, f"{ticker}_{tf}.csv")
-                logging.info(f"🔄 Fetching {ticker} data for timeframe: {tf} (period: {period})...")
-    
+        # One batched request per interval and chunk of 20 symbols (Yahoo's
+        # per-URL limit) instead of one request per ticker per timeframe
+        fetched = {}
+        chunk_size = 20
+
+        for tf in self.intraday_timeframes:
+            period = interval_to_period.get(tf, "60d")  # Default to 60d if not found
+
+            for start in range(0, len(self.tickers), chunk_size):
+                chunk = self.tickers[start:start + chunk_size]
+                logging.info(f"🔄 Fetching {len(chunk)} tickers for timeframe: {tf} (period: {period})...")
+
                 try:
-                    data = yf.download(ticker, interval=tf, period=period, auto_adjust=True)
+                    data = download_with_retry(
+                        " ".join(chunk),
+                        interval=tf,
+                        period=period,
+                        auto_adjust=True,
+                        group_by="ticker",
+                        threads=True,
+                        progress=False,
+                        session=_get_session(self.base_folder),
+                    )
                     if data.empty:
-                        logging.warning(f"⚠️ No data for {ticker} ({tf})")
+                        logging.warning(f"⚠️ No data returned for batch: {chunk} ({tf})")
                         continue
-    
-                    data.reset_index(inplace=True)
-                    data.rename(columns={data.columns[0]: "Datetime"}, inplace=True)
-                    data.to_csv(path, index=False)
-                    logging.info(f"✅ Raw data for {ticker} ({tf}) saved to: {path}")
-    
+
+                    # Single-ticker batches come back with flat columns
+                    if not isinstance(data.columns, pd.MultiIndex):
+                        data = pd.concat({chunk[0]: data}, axis=1)
+
+                    for ticker in data.columns.levels[0]:
+                        ticker_data = data[ticker].dropna(how='all')
+                        if ticker_data.empty:
+                            logging.warning(f"⚠️ No data for {ticker} ({tf})")
+                            continue
+
+                        ticker_data = ticker_data.reset_index()
+                        ticker_data.rename(columns={ticker_data.columns[0]: "Datetime"}, inplace=True)
+                        # Kept in memory for the clean stage; cleaned data
+                        # lands in raw_folder, so no fetched-file round-trip
+                        fetched[f"{ticker}_{tf}.arrow"] = ticker_data
+
                 except Exception as e:
-                    logging.error(f"❌ Error fetching {ticker} ({tf}): {e}")
+                    logging.error(f"❌ Error fetching batch {chunk} ({tf}): {e}")
+
+        expected = len(self.tickers) * len(self.intraday_timeframes)
+        logging.info(f"✅ Intraday data fetched for {len(fetched)}/{expected} ticker/timeframe pairs.")
+        return fetched
 
     """def fetch_intraday_data(self):
         for ticker in self.tickers:
@@ -140,49 +268,75 @@ class IntradayDataHandler:
                 except Exception as e:
                     logging.error(f"❌ Error fetching {ticker} ({tf}): {e}")
     """
-    def clean_fetched_data(self):
+    def _clean_one(self, file, df=None):
+        # Clean one fetched frame (or Arrow file when run standalone);
+        # returns (file, cleaned frame or None, rows with NaNs or None)
+        raw_path = os.path.join(self.raw_folder, file)
+
+        try:
+            if df is None:
+                df = self._read_arrow(os.path.join(self.fetched_folder, file))
+
+            if df.empty:
+                logging.warning(f"⚠️ Skipping empty file: {file}")
+                return file, None, None
+
+            if 'Datetime' not in df.columns:
+                df.columns = df.iloc[0]
+                df = df.iloc[1:].reset_index(drop=True)
+
+            # Remove rows containing ticker in any column (vectorized per
+            # column instead of a Python-level per-row apply)
+            ticker = file.split('_')[0]
+            mask = np.zeros(len(df), dtype=bool)
+            for col in df.columns:
+                mask |= df[col].astype(str).str.contains(ticker, regex=False, na=False).to_numpy()
+            df = df[~mask]
+
+            df['Datetime'] = _parse_datetime_utc(df['Datetime'])
+            df.dropna(subset=['Datetime'], inplace=True)
+            df.set_index('Datetime', inplace=True)
+
+            # Convert all columns to numeric in one pass (avoids N
+            # per-column assignments fragmenting the BlockManager)
+            df = df.apply(pd.to_numeric, errors='coerce')
+
+            # One pass over the NA mask instead of separate any().any()
+            # and row-selection scans
+            row_mask = df.isna().any(axis=1).to_numpy()
+            nan_rows = df[row_mask] if row_mask.any() else None
+
+            self._write_arrow(df.reset_index(), raw_path)
+            logging.info(f"✅ Processed intraday data saved to: {raw_path}")
+            return file, df, nan_rows
+
+        except Exception as e:
+            logging.error(f"❌ Error processing {file}: {e}")
+            return file, None, None
+
+    def clean_fetched_data(self, fetched=None):
         nan_files = {}
-
-        for file in os.listdir(self.fetched_folder):
-            if not file.endswith('.csv'):
-                continue
-
-            tf = file.replace('.csv', '').split('_')[-1]
-            if tf not in self.intraday_timeframes:
-                continue
-
-            fetch_path = os.path.join(self.fetched_folder, file)
-            raw_path = os.path.join(self.raw_folder, file)
-
-            try:
-                df = pd.read_csv(fetch_path)
-
-                if df.empty:
-                    logging.warning(f"⚠️ Skipping empty file: {file}")
-                    continue
-
-                if 'Datetime' not in df.columns:
-                    df.columns = df.iloc[0]
-                    df = df.iloc[1:].reset_index(drop=True)
-
-                ticker = file.split('_')[0]
-                df = df[~df.apply(lambda row: row.astype(str).str.contains(ticker).any(), axis=1)]
-
-                df['Datetime'] = pd.to_datetime(df['Datetime'], utc=True).dt.tz_convert(None)
-                df.dropna(subset=['Datetime'], inplace=True)
-                df.set_index('Datetime', inplace=True)
-
-                for col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-
-                if df.isna().any().any():
-                    nan_files[file] = df[df.isna().any(axis=1)]
-
-                df.to_csv(raw_path)
-                logging.info(f"✅ Processed intraday data saved to: {raw_path}")
-
-            except Exception as e:
-                logging.error(f"❌ Error processing {file}: {e}")
+        if fetched is None:
+            # Standalone run: fall back to whatever the fetched folder holds
+            files = self._timeframe_files(self.fetched_folder)
+            frames = [None] * len(files)
+        else:
+            files = list(fetched)
+            frames = [fetched[f] for f in files]
+
+        cleaned = {}
+        # The per-file pandas work is CPU-bound and independent, so fan it
+        # out across cores; chunksize amortizes the pickling overhead.
+        # forkserver: the orchestrators run this next to threads that log
+        # and do network I/O, and a plain fork can inherit a held logging
+        # lock and deadlock the workers
+        with ProcessPoolExecutor(max_workers=os.cpu_count(),
+                                 mp_context=multiprocessing.get_context("forkserver")) as executor:
+            for file, df, nan_rows in executor.map(self._clean_one, files, frames, chunksize=4):
+                if df is not None:
+                    cleaned[file] = df
+                if nan_rows is not None:
+                    nan_files[file] = nan_rows
 
         if nan_files:
             logging.warning("⚠️ Files with NaNs found:")
@@ -190,50 +344,93 @@ class IntradayDataHandler:
                 print(f"\n🔍 {f}\n{rows}")
         else:
             logging.info("✅ No missing intraday data found.")
+        return cleaned
+
+    def _check_one(self, file, raw_df=None):
+        # Compare one cleaned frame (or raw Arrow file when run standalone)
+        # against its transformed master
+        transf_path = os.path.join(self.transf_folder, file)
+        processed_path = os.path.join(self.processed_folder, file)
+
+        try:
+            if raw_df is None:
+                raw_df = self._read_arrow(os.path.join(self.raw_folder, file))
+                raw_df['Datetime'] = _parse_datetime_utc(raw_df['Datetime'])
+                raw_df.set_index('Datetime', inplace=True)
 
-    def check_new_datetime(self):
-        for file in os.listdir(self.raw_folder):
-            if not file.endswith('.csv'):
-                continue
-
-            tf = file.replace('.csv', '').split('_')[-1]
-            if tf not in self.intraday_timeframes:
-                continue
+            self._migrate_csv_to_arrow(transf_path)
+            if not os.path.exists(transf_path):
+                self._write_arrow(raw_df.reset_index(), transf_path)
+                self._write_meta(transf_path, raw_df.index.max())
+                logging.info(f"✅ New master file created: {transf_path}")
+                return
 
-            raw_path = os.path.join(self.raw_folder, file)
-            transf_path = os.path.join(self.transf_folder, file)
-            processed_path = os.path.join(self.processed_folder, file)
+            max_dt = self._read_meta_latest(transf_path)
+            if max_dt is not None:
+                # Both inputs are time-sorted, so everything after the stored
+                # max is new: no per-row isin hashing, no dedup, no re-sort
+                new_rows = raw_df.loc[raw_df.index > max_dt]
 
-            try:
-                raw_df = pd.read_csv(raw_path, parse_dates=['Datetime'])
-                raw_df['Datetime'] = pd.to_datetime(raw_df['Datetime'], utc=True).dt.tz_convert(None)
-                raw_df.set_index('Datetime', inplace=True)
+                if new_rows.empty:
+                    logging.info(f"ℹ️ No new data found for {file}.")
+                    return
 
-                if not os.path.exists(transf_path):
-                    raw_df.to_csv(transf_path)
-                    logging.info(f"✅ New master file created: {transf_path}")
-                    continue
+                self._write_arrow(new_rows.reset_index(), processed_path)
+                logging.info(f"✅ New data detected and saved to: {processed_path}")
 
-                transf_df = pd.read_csv(transf_path, parse_dates=['Datetime'])
-                transf_df['Datetime'] = pd.to_datetime(transf_df['Datetime'], utc=True).dt.tz_convert(None)
+                transf_df = self._read_arrow(transf_path)
+                transf_df['Datetime'] = _parse_datetime_utc(transf_df['Datetime'])
                 transf_df.set_index('Datetime', inplace=True)
 
-                new_rows = raw_df.loc[~raw_df.index.isin(transf_df.index)]
+                combined = pd.concat([transf_df, new_rows], copy=False)
+                self._write_arrow(combined.reset_index(), transf_path)
+                self._write_meta(transf_path, new_rows.index.max())
+                logging.info(f"✅ Appended new data and updated: {transf_path}")
+                return
+
+            # No sidecar yet: fall back to the full index diff
+            transf_df = self._read_arrow(transf_path)
+            transf_df['Datetime'] = _parse_datetime_utc(transf_df['Datetime'])
+            transf_df.set_index('Datetime', inplace=True)
+
+            new_rows = raw_df.loc[~raw_df.index.isin(transf_df.index)]
 
-                if not new_rows.empty:
-                    new_rows.to_csv(processed_path)
-                    logging.info(f"✅ New data detected and saved to: {processed_path}")
+            if not new_rows.empty:
+                self._write_arrow(new_rows.reset_index(), processed_path)
+                logging.info(f"✅ New data detected and saved to: {processed_path}")
 
+                if transf_df.index.is_monotonic_increasing and new_rows.index.min() > transf_df.index.max():
+                    # Already-sorted master plus a strictly newer tail: the
+                    # concat result is sorted and duplicate-free as-is
+                    combined = pd.concat([transf_df, new_rows], copy=False)
+                else:
                     combined = pd.concat([transf_df, new_rows])
                     combined = combined[~combined.index.duplicated(keep='first')]
                     combined.sort_index(inplace=True)
-                    combined.to_csv(transf_path)
-                    logging.info(f"✅ Appended new data and updated: {transf_path}")
-                else:
-                    logging.info(f"ℹ️ No new data found for {file}.")
-
-            except Exception as e:
-                logging.error(f"❌ Error comparing/appending for {file}: {e}")
+                self._write_arrow(combined.reset_index(), transf_path)
+                self._write_meta(transf_path, combined.index.max())
+                logging.info(f"✅ Appended new data and updated: {transf_path}")
+            else:
+                self._write_meta(transf_path, transf_df.index.max())
+                logging.info(f"ℹ️ No new data found for {file}.")
+
+        except Exception as e:
+            logging.error(f"❌ Error comparing/appending for {file}: {e}")
+
+    def check_new_datetime(self, cleaned=None):
+        if cleaned is None:
+            # Standalone run: re-read the cleaned frames from the raw folder
+            files = self._timeframe_files(self.raw_folder)
+            frames = [None] * len(files)
+        else:
+            files = list(cleaned)
+            frames = [cleaned[f] for f in files]
+
+        # Per-file targets are disjoint, so the merges can run in parallel;
+        # forkserver for the same fork-under-threads reason as the clean stage
+        with ProcessPoolExecutor(max_workers=os.cpu_count(),
+                                 mp_context=multiprocessing.get_context("forkserver")) as executor:
+            list(executor.map(self._check_one, files, frames, chunksize=4))
 
 
 
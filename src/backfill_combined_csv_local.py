@@ -5,13 +5,23 @@ Upload only new data (after latest timestamp in Postgres) to the 'yfin' table.
 Schema: ticker (text), timeframe (text), timestamp (timestamptz), open (double), high (double), low (double), close (double), volume (double)
 """
 
+import io
+import json
 import os
-import glob
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as pa_ds
 from dotenv import load_dotenv
 import psycopg2
 from psycopg2.extras import execute_values
 
+try:
+    from src.scan_utils import scan_files
+except ImportError:
+    from scan_utils import scan_files
+
 # Load environment variables from .env
 load_dotenv(os.path.join(os.path.dirname(__file__), "../.env"))
 DB_NAME = os.getenv("DB_NAME")
@@ -22,75 +32,167 @@ DB_PORT = os.getenv("DB_PORT")
 
 # Set paths
 transf_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), "../all_ohclv_data/transf_data/"))
-all_csvs = glob.glob(os.path.join(transf_folder, "*.csv"))
+state_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../state/high_water.json"))
+
+def load_high_water():
+    # This script is the table's only writer, so the locally persisted
+    # high-water mark replaces the full-scan SELECT MAX on most runs
+    try:
+        with open(state_path) as f:
+            return pd.to_datetime(json.load(f)["yfin_max_ts"], utc=True)
+    except (OSError, KeyError, ValueError):
+        return None
+
+def save_high_water(ts):
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    with open(state_path, "w") as f:
+        json.dump({"yfin_max_ts": pd.Timestamp(ts).isoformat()}, f)
 
-def load_and_format(filepath):
-    df = pd.read_csv(filepath)
+def read_transf_file(filepath, latest_ts=None):
+    if filepath.endswith(".parquet") or filepath.endswith(".arrow"):
+        fmt = "parquet" if filepath.endswith(".parquet") else "feather"
+        dataset = pa_ds.dataset(filepath, format=fmt)
+        date_col = "Date" if "Date" in dataset.schema.names else "Datetime"
+        # Predicate pushdown: rows at or before the Postgres high-water
+        # mark are skipped at scan time instead of parsed then discarded
+        filt = None
+        if latest_ts is not None:
+            min_naive = pd.Timestamp(latest_ts)
+            if min_naive.tzinfo is not None:
+                # Stored columns are tz-naive UTC wall times
+                min_naive = min_naive.tz_convert("UTC").tz_localize(None)
+            filt = pc.field(date_col) > pa.scalar(min_naive)
+        return dataset.to_table(filter=filt).to_pandas()
+    return pd.read_csv(filepath, engine='pyarrow')
+
+def load_and_format(entry, latest_ts=None):
+    # scan_files already parsed ticker/timeframe once per folder state,
+    # so no basename splitting is repeated here
+    filepath, ticker, timeframe = entry
+    df = read_transf_file(filepath, latest_ts)
     # Determine if daily or intraday by column name
     if "Date" in df.columns:
-        df.rename(columns={"Date": "timestamp"}, inplace=True)
+        date_col = "Date"
     elif "Datetime" in df.columns:
-        df.rename(columns={"Datetime": "timestamp"}, inplace=True)
+        date_col = "Datetime"
     else:
         raise ValueError(f"File {filepath} missing Date or Datetime column")
-    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
-    base = os.path.basename(filepath).replace(".csv", "")
-    parts = base.split("_")
-    ticker = parts[0]
-    timeframe = parts[-1]
-    df["ticker"] = ticker
-    df["timeframe"] = timeframe
-    # Ensure correct column order and types
-    df = df.rename(columns={
+    # One rename covering every column: each rename call walks the whole
+    # BlockManager, so fold them into a single pass
+    df.rename(columns={
+        date_col: "timestamp",
         "Open": "open",
         "High": "high",
         "Low": "low",
         "Close": "close",
         "Volume": "volume"
-    })
+    }, inplace=True)
+    # Parquet/Arrow files arrive already typed; legacy CSV strings take the
+    # ISO8601 fast path instead of per-value inference
+    if pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
+        df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
+    else:
+        df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, format='ISO8601')
+    df["ticker"] = ticker
+    df["timeframe"] = timeframe
+    # CSVs cannot be filtered at scan time, so filter after the parse;
+    # both sides drop to naive-UTC datetime64 so the comparison is one
+    # numpy pass with no per-element tz handling
+    if latest_ts is not None and filepath.endswith(".csv"):
+        cutoff = pd.Timestamp(latest_ts)
+        if cutoff.tzinfo is not None:
+            cutoff = cutoff.tz_convert("UTC").tz_localize(None)
+        mask = df["timestamp"].to_numpy(dtype="datetime64[ns]") > cutoff.to_datetime64()
+        df = df[mask]
+    # Ensure correct column order
     return df[["ticker", "timeframe", "timestamp", "open", "high", "low", "close", "volume"]]
 
-# Combine all timeframes into one DataFrame
-all_df = pd.concat([load_and_format(f) for f in all_csvs], ignore_index=True) if all_csvs else pd.DataFrame()
-print(f"Combined {len(all_df)} rows from all timeframes.")
-
 def get_latest_timestamp_pg(conn, table_name):
     with conn.cursor() as cur:
         cur.execute(f"SELECT MAX(timestamp) FROM {table_name}")
         result = cur.fetchone()
         return result[0] if result else None
 
-def upload_to_pg(df, table_name):
+def upload_to_pg(conn, df, table_name):
     if df.empty:
         print(f"No new data to upload for {table_name}")
         return
-    # Prepare data as list of tuples
-    tuples = [tuple(x) for x in df.to_numpy()]
     cols = ','.join(df.columns)
-    query = f"INSERT INTO {table_name} ({cols}) VALUES %s ON CONFLICT DO NOTHING"
-    with conn.cursor() as cur:
-        execute_values(cur, query, tuples)
-    conn.commit()
+    try:
+        # COPY streams one CSV-framed pipe instead of having the server
+        # parse N parameterized VALUES tuples; staging through a temp
+        # table keeps the ON CONFLICT DO NOTHING semantics
+        buf = io.StringIO()
+        df.to_csv(buf, index=False, header=False)
+        buf.seek(0)
+        with conn.cursor() as cur:
+            cur.execute(
+                f"CREATE TEMP TABLE {table_name}_stage "
+                f"(LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DROP"
+            )
+            cur.copy_expert(
+                f"COPY {table_name}_stage ({cols}) FROM STDIN WITH (FORMAT CSV)", buf
+            )
+            cur.execute(
+                f"INSERT INTO {table_name} SELECT * FROM {table_name}_stage "
+                f"ON CONFLICT DO NOTHING"
+            )
+        conn.commit()
+    except Exception as e:
+        print(f"COPY upload failed ({e}), falling back to execute_values")
+        conn.rollback()
+        query = f"INSERT INTO {table_name} ({cols}) VALUES %s ON CONFLICT DO NOTHING"
+        with conn.cursor() as cur:
+            # itertuples streams rows without materializing a list of
+            # boxed tuples first; the larger page_size cuts roundtrips
+            execute_values(cur, query,
+                           df.itertuples(index=False, name=None),
+                           page_size=10_000)
+        conn.commit()
     print(f"Uploaded {len(df)} rows to {table_name}")
 
-# Connect to Postgres
-conn = psycopg2.connect(
-    dbname=DB_NAME,
-    user=DB_USER,
-    password=DB_PASSWORD,
-    host=DB_HOST,
-    port=DB_PORT
-)
-
-# Table name
-yfin_table = "yfin"
-
-# Upload only new data
-if not all_df.empty:
-    latest_ts = get_latest_timestamp_pg(conn, yfin_table)
-    if latest_ts:
-        latest_ts = pd.to_datetime(latest_ts)
-        all_df = all_df[all_df["timestamp"] > latest_ts]
-    upload_to_pg(all_df, yfin_table)
-
-conn.close()
\ No newline at end of file
+def main():
+    # Daily files are Parquet, intraday files are Arrow IPC; CSVs are legacy
+    all_files = sorted(scan_files(transf_folder, suffixes={".csv", ".parquet", ".arrow"}))
+
+    # Connect to Postgres
+    conn = psycopg2.connect(
+        dbname=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=DB_PORT
+    )
+
+    # Table name
+    yfin_table = "yfin"
+
+    # Fetch the high-water mark first so every file only materializes
+    # rows newer than what the table already holds; the persisted sidecar
+    # avoids the MAX(timestamp) full scan except on first/recovery runs
+    latest_ts = load_high_water()
+    if latest_ts is None:
+        latest_ts = get_latest_timestamp_pg(conn, yfin_table)
+        if latest_ts:
+            latest_ts = pd.to_datetime(latest_ts, utc=True)
+
+    # Combine only the new rows from all timeframes; the per-file scans
+    # are independent and the Arrow readers release the GIL, so overlap them
+    if all_files:
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+            frames = list(executor.map(
+                lambda f: load_and_format(f, latest_ts=latest_ts), all_files))
+        all_df = pd.concat(frames, ignore_index=True, copy=False)
+    else:
+        all_df = pd.DataFrame()
+    print(f"Combined {len(all_df)} new rows from all timeframes.")
+
+    # Upload only new data
+    if not all_df.empty:
+        upload_to_pg(conn, all_df, yfin_table)
+        save_high_water(all_df["timestamp"].max())
+
+    conn.close()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
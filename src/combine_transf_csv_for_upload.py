@@ -1,15 +1,25 @@
 """
-Combine all CSV files in all_ohclv_data/transf_data into one DataFrame.
-Separate daily timeframe (_1d.csv) from intraday.
+Combine all transf files in all_ohclv_data/transf_data into one DataFrame.
+Separate daily timeframe (_1d) from intraday.
 Upload only new data (after latest date in BigQuery) to respective tables.
 """
 
+import io
 import os
-import glob
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as pa_ds
+from google.api_core.exceptions import NotFound
 from google.cloud import bigquery
 from dotenv import load_dotenv
 
+try:
+    from src.scan_utils import scan_files
+except ImportError:
+    from scan_utils import scan_files
+
 # Load environment variables from .env
 load_dotenv(os.path.join(os.path.dirname(__file__), "../.env"))
 daily_table_id = os.getenv("daily_datset_bq")
@@ -17,40 +27,6 @@ intraday_table_id = os.getenv("intraday_dataset_bq")
 
 # Set paths
 transf_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), "../all_ohclv_data/transf_data/"))
-all_csvs = glob.glob(os.path.join(transf_folder, "*.csv"))
-
-# Separate daily and intraday files
-daily_files = [f for f in all_csvs if f.endswith("_1d.csv")]
-intraday_files = [f for f in all_csvs if not f.endswith("_1d.csv")]
-
-def load_and_format(filepath, is_daily=False):
-    df = pd.read_csv(filepath)
-    if is_daily:
-        df["Date"] = pd.to_datetime(df["Date"])
-    else:
-        df.rename(columns={"Datetime": "Date"}, inplace=True)
-        df["Date"] = pd.to_datetime(df["Date"])
-    base = os.path.basename(filepath).replace(".csv", "")
-    parts = base.split("_")
-    ticker = parts[0]
-    timeframe = parts[-1]
-    df["Ticker"] = ticker
-    df["Timeframe"] = timeframe
-    return df[["Date", "Ticker", "Timeframe", "Open", "High", "Low", "Close", "Volume"]]
-
-# Combine all daily and intraday data
-daily_df = pd.concat([load_and_format(f, is_daily=True) for f in daily_files], ignore_index=True) if daily_files else pd.DataFrame()
-intraday_df = pd.concat([load_and_format(f, is_daily=False) for f in intraday_files], ignore_index=True) if intraday_files else pd.DataFrame()
-print(f"Combined {len(daily_df)} daily rows and {len(intraday_df)} intraday rows.")
-
-client = bigquery.Client()
-
-def get_latest_date(table_id, date_col="Date"):
-    query = f"SELECT MAX({date_col}) as max_date FROM `{table_id}`"
-    result = client.query(query).result()
-    for row in result:
-        return row.max_date
-    return None
 
 def make_tz_naive(dt):
     # Converts a pandas.Timestamp or datetime to tz-naive
@@ -62,26 +38,121 @@ def make_tz_naive(dt):
         return dt.replace(tzinfo=None)
     return dt
 
-def upload_to_bq(df, table_id):
+def get_latest_dates(client, table_id):
+    # Per-(ticker, timeframe) max dates, so each file is filtered to its
+    # delta at scan time instead of loading full histories client-side
+    query = f"SELECT Ticker, Timeframe, MAX(Date) AS max_date FROM `{table_id}` GROUP BY Ticker, Timeframe"
+    # Only a missing table (first upload) legitimately means "everything
+    # is new". Any other failure must propagate: an empty map here would
+    # re-append full histories under WRITE_APPEND with no dedup
+    try:
+        return {
+            (row.Ticker, row.Timeframe): make_tz_naive(pd.to_datetime(row.max_date))
+            for row in client.query(query).result()
+        }
+    except NotFound:
+        print(f"Table {table_id} not found, treating all data as new")
+        return {}
+
+def read_transf_file(filepath, min_date=None):
+    if filepath.endswith(".parquet") or filepath.endswith(".arrow"):
+        fmt = "parquet" if filepath.endswith(".parquet") else "feather"
+        dataset = pa_ds.dataset(filepath, format=fmt)
+        date_col = "Date" if "Date" in dataset.schema.names else "Datetime"
+        # Predicate pushdown: only delta rows are materialized
+        filt = pc.field(date_col) > pa.scalar(min_date) if min_date is not None else None
+        return dataset.to_table(filter=filt).to_pandas()
+    # Arrow-backed dtypes keep legacy CSV data zero-copy all the way to
+    # the Parquet upload buffer instead of round-tripping through numpy
+    return pd.read_csv(filepath, engine='pyarrow', dtype_backend='pyarrow')
+
+def load_and_format(entry, is_daily=False, latest_map=None, categories=None):
+    # scan_files already parsed ticker/timeframe once per folder state,
+    # so no basename splitting is repeated here
+    filepath, ticker, timeframe = entry
+
+    min_date = (latest_map or {}).get((ticker, timeframe))
+    df = read_transf_file(filepath, min_date=min_date)
+    if not is_daily:
+        df.rename(columns={"Datetime": "Date"}, inplace=True)
+    # Parquet/Arrow files arrive already typed; legacy CSV strings take the
+    # ISO8601 fast path instead of per-value inference
+    if not pd.api.types.is_datetime64_any_dtype(df["Date"]):
+        df["Date"] = pd.to_datetime(df["Date"], format='ISO8601')
+        if min_date is not None:
+            # CSVs cannot be filtered at scan time, so filter after the
+            # parse; comparing raw datetime64 arrays skips the Series
+            # dtype-dispatch and index machinery
+            mask = df["Date"].to_numpy(dtype="datetime64[ns]") > pd.Timestamp(min_date).to_datetime64()
+            df = df[mask]
+    # Categoricals store one code per row instead of an object string,
+    # cutting memory ~10x on the combined frame
+    all_tickers, all_timeframes = categories
+    df["Ticker"] = pd.Categorical([ticker] * len(df), categories=all_tickers)
+    df["Timeframe"] = pd.Categorical([timeframe] * len(df), categories=all_timeframes)
+    return df[["Date", "Ticker", "Timeframe", "Open", "High", "Low", "Close", "Volume"]]
+
+def load_many(files, is_daily, latest_map, categories):
+    if not files:
+        return pd.DataFrame()
+    # The per-file scans are independent and the Arrow readers release the
+    # GIL, so overlap them instead of loading one file at a time
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        frames = list(executor.map(
+            lambda f: load_and_format(f, is_daily=is_daily, latest_map=latest_map,
+                                      categories=categories), files))
+    return pd.concat(frames, ignore_index=True)
+
+def upload_to_bq(client, df, table_id):
     if df.empty:
         print(f"No new data to upload for {table_id}")
         return
-    job = client.load_table_from_dataframe(df, table_id)
+    # Serialize to Parquet once and stream the buffer; avoids the client's
+    # implicit DataFrame conversion and keeps the upload body compact
+    buf = io.BytesIO()
+    df.to_parquet(buf, engine='pyarrow', compression='snappy', index=False)
+    buf.seek(0)
+    job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.PARQUET,
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+    )
+    job = client.load_table_from_file(buf, table_id, job_config=job_config)
     job.result()
     print(f"Uploaded {len(df)} rows to {table_id}")
 
-# Upload only new daily data
-if not daily_df.empty and daily_table_id:
-    latest_daily = get_latest_date(daily_table_id, "Date")
-    if latest_daily:
-        latest_daily_naive = pd.to_datetime(latest_daily).replace(tzinfo=None)
-        daily_df = daily_df[daily_df["Date"] > latest_daily_naive]
-    upload_to_bq(daily_df, daily_table_id)
-
-# Upload only new intraday data
-if not intraday_df.empty and intraday_table_id:
-    latest_intraday = get_latest_date(intraday_table_id, "Date")
-    if latest_intraday:
-        latest_intraday_naive = pd.to_datetime(latest_intraday).replace(tzinfo=None)
-        intraday_df = intraday_df[intraday_df["Date"] > latest_intraday_naive]
-    upload_to_bq(intraday_df, intraday_table_id)
\ No newline at end of file
+def main():
+    # Daily files are Parquet, intraday files are Arrow IPC; CSVs are legacy.
+    # One pass over the cached scan classifies the files and collects the
+    # shared category sets, instead of re-splitting basenames per list
+    daily_files, intraday_files = [], []
+    tickers_seen, timeframes_seen = set(), set()
+    for entry in sorted(scan_files(transf_folder, suffixes={".csv", ".parquet", ".arrow"})):
+        _, ticker, timeframe = entry
+        (daily_files if timeframe == "1d" else intraday_files).append(entry)
+        tickers_seen.add(ticker)
+        timeframes_seen.add(timeframe)
+
+    # Shared category sets so the per-file Categoricals survive pd.concat
+    categories = (sorted(tickers_seen), sorted(timeframes_seen))
+
+    client = bigquery.Client()
+
+    # Fetch the per-ticker watermarks once per table
+    daily_latest = get_latest_dates(client, daily_table_id) if daily_table_id else {}
+    intraday_latest = get_latest_dates(client, intraday_table_id) if intraday_table_id else {}
+
+    # Combine and upload one table at a time so peak memory holds a single
+    # combined frame (intraday dwarfs daily), not both at once
+    daily_df = load_many(daily_files, True, daily_latest, categories)
+    print(f"Combined {len(daily_df)} new daily rows.")
+    if daily_table_id:
+        upload_to_bq(client, daily_df, daily_table_id)
+    del daily_df
+
+    intraday_df = load_many(intraday_files, False, intraday_latest, categories)
+    print(f"Combined {len(intraday_df)} new intraday rows.")
+    if intraday_table_id:
+        upload_to_bq(client, intraday_df, intraday_table_id)
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,12 @@ import numpy as np
 import yfinance as yf
 import datetime
 import os
+import shutil
+
+try:
+    from src.scan_utils import scan_files
+except ImportError:
+    from scan_utils import scan_files
 
 ticker = []
 timeframe = "1d"
@@ -14,13 +20,12 @@ data_playground = "all_ohclv_data/playground"
 
 
 
-# find all files in data_transf that end with "_{tmeframe}.csv"
-for file in os.listdir(data_transf):
-    if file.endswith(f"_{timeframe}.csv"):
-        # get the ticker from the file name
-        ticker.append(file.split("_")[0])
-        # copy the file to data_playground folder
-        os.system(f"cp {data_transf}/{file} {data_playground}/{file}")
-        
-# delete column from data_playground 
-# cols: Rolling_Outlier_Close,Z_Outlier_Close,Z_Outlier_Volume,Changepoint_RPT_Close,CUSUM_Change,
\ No newline at end of file
+# find all daily files in data_transf (Parquet store plus any legacy CSVs)
+for path, tick, tf in scan_files(data_transf, suffixes={".parquet", ".csv"}, timeframes={timeframe}):
+    ticker.append(tick)
+    # copy the file to data_playground folder; shutil stays in-process
+    # instead of forking a shell and a cp per file
+    shutil.copyfile(path, os.path.join(data_playground, os.path.basename(path)))
+
+# delete column from data_playground
+# cols: Rolling_Outlier_Close,Z_Outlier_Close,Z_Outlier_Volume,Changepoint_RPT_Close,CUSUM_Change,
@@ -3,15 +3,22 @@ Data Quality Monitoring Module
 Detects data quality issues and generates visual reports with candlestick charts
 """
 
+import multiprocessing
 import os
-import glob
 import pandas as pd
 import numpy as np
+import pyarrow.feather as feather
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 import logging
 from dotenv import load_dotenv
 
+try:
+    from src.scan_utils import scan_files
+except ImportError:
+    from scan_utils import scan_files
+
 try:
     import plotly.graph_objects as go
     from plotly.subplots import make_subplots
@@ -101,10 +108,14 @@ class DataQualityMonitor:
         
         # Check for outliers using Z-score (price changes > 3 standard deviations)
         if "Close" in df.columns and len(df) > 1:
-            returns = df["Close"].pct_change().dropna()
-            if len(returns) > 0:
-                z_scores = np.abs((returns - returns.mean()) / returns.std())
-                outliers = (z_scores > 3).sum()
+            # Compute returns in one numpy pass instead of the
+            # pct_change/dropna Series round-trip
+            close = df["Close"].to_numpy(dtype=np.float64)
+            returns = close[1:] / close[:-1] - 1.0
+            returns = returns[~np.isnan(returns)]
+            if returns.size > 0:
+                z_scores = np.abs((returns - returns.mean()) / returns.std(ddof=1))
+                outliers = np.count_nonzero(z_scores > 3)
                 if outliers > 0:
                     issues.append({
                         "type": "outlier_detection",
@@ -113,48 +124,59 @@ class DataQualityMonitor:
         
         # Check for gaps in time series
         date_col = "Date" if "Date" in df.columns else "Datetime"
-        if date_col in df.columns:
-            df_sorted = df.sort_values(date_col)
+        if date_col in df.columns and len(df) > 1:
+            # Diff int64 nanoseconds directly; comparing a TimedeltaIndex
+            # against Timedelta objects allocates per-element
+            ts = np.sort(df[date_col].to_numpy(dtype="datetime64[ns]").view("i8"))
+            diffs = np.diff(ts)
             if timeframe == "1d":
-                # For daily data, check for missing trading days (allow weekends)
-                date_diff = df_sorted[date_col].diff()
-                # More than 3 days gap might indicate missing data
-                large_gaps = (date_diff > pd.Timedelta(days=3)).sum()
+                # For daily data, more than 3 days gap might indicate
+                # missing data (weekends are allowed)
+                large_gaps = np.count_nonzero(diffs > 3 * 86400 * 10**9)
                 if large_gaps > 0:
                     issues.append({
                         "type": "time_gaps",
                         "message": f"Large time gaps detected: {large_gaps} gaps > 3 days"
                     })
-            else:
-                # For intraday, check for expected intervals
-                date_diff = df_sorted[date_col].diff()
-                # This is a simplified check - actual expected interval depends on timeframe
-                if len(date_diff) > 1:
-                    median_interval = date_diff.median()
-                    # Flag if more than 10x median interval
-                    large_gaps = (date_diff > median_interval * 10).sum()
-                    if large_gaps > 0:
-                        issues.append({
-                            "type": "time_gaps",
-                            "message": f"Large time gaps detected: {large_gaps} gaps"
-                        })
+            elif diffs.size > 0:
+                # For intraday, flag gaps beyond 10x the median interval -
+                # a simplified check since the expected interval depends
+                # on the timeframe
+                median_interval = np.median(diffs)
+                large_gaps = np.count_nonzero(diffs > median_interval * 10)
+                if large_gaps > 0:
+                    issues.append({
+                        "type": "time_gaps",
+                        "message": f"Large time gaps detected: {large_gaps} gaps"
+                    })
         
         return issues
     
-    def generate_chart(self, df, ticker, timeframe, issues, output_path):
+    def generate_chart(self, df, ticker, timeframe, issues, output_path, source_path=None):
         """Generate candlestick chart with volume"""
         if not PLOTLY_AVAILABLE:
             logger.warning("Plotly not available, skipping chart generation")
             return
-        
+
         date_col = "Date" if "Date" in df.columns else "Datetime"
         if date_col not in df.columns:
             logger.warning(f"Cannot generate chart for {ticker}_{timeframe}: no date column")
             return
-        
+
+        # Skip regeneration when the chart is already newer than the data
+        if source_path is not None and os.path.exists(output_path):
+            if os.path.getmtime(output_path) >= os.path.getmtime(source_path):
+                logger.debug(f"Chart up to date, skipping: {output_path}")
+                return
+
         # Prepare data
         df_sorted = df.sort_values(date_col).copy()
         df_sorted = df_sorted.reset_index()
+
+        # Downsample to at most ~5000 points; full-resolution intraday
+        # candlesticks are unreadable and dominate the HTML size
+        if len(df_sorted) > 5000:
+            df_sorted = df_sorted.iloc[::max(1, len(df_sorted) // 5000)]
         
         # Create subplots
         fig = make_subplots(
@@ -215,78 +237,102 @@ class DataQualityMonitor:
         fig.update_yaxes(title_text="Price", row=1, col=1)
         fig.update_yaxes(title_text="Volume", row=2, col=1)
         
-        # Save chart
-        fig.write_html(str(output_path))
+        # Save chart; loading plotly.js from the CDN instead of embedding
+        # it drops ~3MB from every file
+        fig.write_html(str(output_path), include_plotlyjs='cdn', full_html=True)
         logger.info(f"Generated chart: {output_path}")
     
+    @staticmethod
+    def _load_data(filepath):
+        """Read a transf file regardless of its on-disk format"""
+        if filepath.endswith(".parquet"):
+            return pd.read_parquet(filepath)
+        if filepath.endswith(".arrow"):
+            return feather.read_table(filepath, memory_map=True).to_pandas()
+        return pd.read_csv(filepath)
+
+    def _check_one_file(self, entry):
+        """Per-file quality pass; pure so it can run in a worker process"""
+        filepath, ticker, timeframe = entry
+        try:
+            df = self._load_data(filepath)
+            date_col = "Date" if "Date" in df.columns else "Datetime"
+            if date_col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+                df[date_col] = pd.to_datetime(df[date_col])
+
+            issues = self.check_data_quality(df, ticker, timeframe)
+
+            chart_path = self.report_dir / f"{ticker}_{timeframe}_chart.html"
+            self.generate_chart(df, ticker, timeframe, issues, chart_path, source_path=filepath)
+
+            return {
+                "ticker": ticker,
+                "timeframe": timeframe,
+                "records": len(df),
+                "issues": len(issues),
+                "issue_details": issues
+            }
+        except Exception as e:
+            logger.error(f"Error processing {filepath}: {e}", exc_info=True)
+            return {
+                "ticker": ticker,
+                "timeframe": timeframe,
+                "records": 0,
+                "issues": 0,
+                "issue_details": [],
+                "error": str(e)
+            }
+
     def run_checks(self):
         """Run quality checks on all data files"""
         logger.info("Starting data quality checks...")
-        
-        # Find all CSV files
-        csv_files = glob.glob(os.path.join(self.transf_folder, "*.csv"))
-        self.stats["total_files"] = len(csv_files)
-        
-        if not csv_files:
-            logger.warning("No CSV files found for quality checks")
+
+        # Find all data files (Parquet for daily, Arrow for intraday, legacy CSV)
+        data_files = scan_files(self.transf_folder, suffixes={".csv", ".parquet", ".arrow"})
+        self.stats["total_files"] = len(data_files)
+
+        if not data_files:
+            logger.warning("No data files found for quality checks")
             return
-        
-        report_data = []
-        
-        for csv_file in csv_files:
-            try:
-                # Parse ticker and timeframe from filename
-                filename = os.path.basename(csv_file).replace(".csv", "")
-                parts = filename.split("_")
-                ticker = parts[0]
-                timeframe = parts[-1]
-                
-                # Load data
-                df = pd.read_csv(csv_file)
-                date_col = "Date" if "Date" in df.columns else "Datetime"
-                if date_col in df.columns:
-                    df[date_col] = pd.to_datetime(df[date_col])
-                
-                self.stats["total_records"] += len(df)
-                
-                # Run quality checks
-                issues = self.check_data_quality(df, ticker, timeframe)
-                
-                if issues:
-                    self.stats["files_with_issues"] += 1
-                    self.stats["anomalies_detected"] += len(issues)
-                    self.issues.extend([{**issue, "ticker": ticker, "timeframe": timeframe} for issue in issues])
-                
-                # Generate chart
-                chart_path = self.report_dir / f"{ticker}_{timeframe}_chart.html"
-                self.generate_chart(df, ticker, timeframe, issues, chart_path)
-                
-                report_data.append({
-                    "ticker": ticker,
-                    "timeframe": timeframe,
-                    "records": len(df),
-                    "issues": len(issues),
-                    "issue_details": issues
-                })
-                
-            except Exception as e:
-                logger.error(f"Error processing {csv_file}: {e}", exc_info=True)
+
+        # Each file is independent (checks + chart rendering), so fan the
+        # loop out across processes and aggregate the returned results
+        # forkserver: service.py runs this stage alongside threads that
+        # log and do network I/O, and forking under a held logging lock
+        # can deadlock the workers
+        with ProcessPoolExecutor(mp_context=multiprocessing.get_context("forkserver")) as executor:
+            report_data = list(executor.map(self._check_one_file, data_files, chunksize=4))
+
+        for data in report_data:
+            if "error" in data:
                 self.issues.append({
                     "type": "processing_error",
-                    "ticker": filename,
-                    "message": str(e)
+                    "ticker": data["ticker"],
+                    "timeframe": data["timeframe"],
+                    "message": data["error"]
                 })
-        
+                continue
+            self.stats["total_records"] += data["records"]
+            if data["issues"] > 0:
+                self.stats["files_with_issues"] += 1
+                self.stats["anomalies_detected"] += data["issues"]
+                self.issues.extend([
+                    {**issue, "ticker": data["ticker"], "timeframe": data["timeframe"]}
+                    for issue in data["issue_details"]
+                ])
+
         # Generate summary report
         self.generate_summary_report(report_data)
-        
+
         logger.info(f"Quality checks completed: {self.stats['files_with_issues']} files with issues out of {self.stats['total_files']} total files")
     
     def generate_summary_report(self, report_data):
         """Generate HTML summary report"""
         report_path = self.report_dir / f"quality_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-        
-        html_content = f"""
+
+        # Collect fragments and join once at the end; += on a str inside
+        # the loops recopies the whole accumulated buffer each iteration
+        parts = [f"""
 <!DOCTYPE html>
 <html>
 <head>
@@ -328,14 +374,14 @@ class DataQualityMonitor:
             <th>Status</th>
             <th>Chart</th>
         </tr>
-"""
-        
+"""]
+
         for data in report_data:
             status_class = "issue" if data["issues"] > 0 else "ok"
             status_text = "⚠️ Issues Found" if data["issues"] > 0 else "✓ OK"
             chart_link = f'<a href="{data["ticker"]}_{data["timeframe"]}_chart.html">View Chart</a>' if PLOTLY_AVAILABLE else "N/A"
-            
-            html_content += f"""
+
+            parts.append(f"""
         <tr>
             <td>{data['ticker']}</td>
             <td>{data['timeframe']}</td>
@@ -344,11 +390,11 @@ class DataQualityMonitor:
             <td class="{status_class}">{status_text}</td>
             <td>{chart_link}</td>
         </tr>
-"""
-        
-        html_content += """
+""")
+
+        parts.append("""
     </table>
-    
+
     <h2>Issue Details</h2>
     <table>
         <tr>
@@ -357,28 +403,28 @@ class DataQualityMonitor:
             <th>Issue Type</th>
             <th>Message</th>
         </tr>
-"""
-        
+""")
+
         for issue in self.issues:
             ticker = issue.get("ticker", "N/A")
             timeframe = issue.get("timeframe", "N/A")
-            html_content += f"""
+            parts.append(f"""
         <tr>
             <td>{ticker}</td>
             <td>{timeframe}</td>
             <td>{issue['type']}</td>
             <td>{issue['message']}</td>
         </tr>
-"""
-        
-        html_content += """
+""")
+
+        parts.append("""
     </table>
 </body>
 </html>
-"""
-        
+""")
+
         with open(report_path, "w") as f:
-            f.write(html_content)
+            f.write("".join(parts))
         
         logger.info(f"Quality report saved: {report_path}")
 
@@ -0,0 +1,27 @@
+"""
+Shared retry wrapper around yf.download used by both handlers.
+
+Yahoo intermittently rate-limits or drops batched requests; a few
+retries with exponential backoff plus jitter recover most transient
+failures without hammering the endpoint, while a persistent failure
+still surfaces to the caller's batch-level error handling.
+"""
+
+import logging
+import random
+import time
+
+import yfinance as yf
+
+
+def download_with_retry(symbols, retries=3, base_delay=2.0, **kwargs):
+    """Call yf.download, retrying transient failures with backoff + jitter"""
+    for attempt in range(retries):
+        try:
+            return yf.download(symbols, **kwargs)
+        except Exception as e:
+            if attempt == retries - 1:
+                raise
+            delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
+            logging.warning(f"⚠️ yf.download failed (attempt {attempt + 1}/{retries}): {e}; retrying in {delay:.1f}s")
+            time.sleep(delay)
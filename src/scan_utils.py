@@ -0,0 +1,48 @@
+"""
+Shared directory-scan helper for the data pipeline.
+Every stage used to re-walk the data folders with os.listdir/glob.glob and
+re-split filenames; this does one os.scandir pass per folder state and
+memoizes the parsed (path, ticker, timeframe) tuples for the process.
+"""
+
+import os
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def _scan_cached(folder, mtime):
+    # mtime keys the cache so adding/removing files invalidates the entry
+    entries = []
+    with os.scandir(folder) as it:
+        for entry in it:
+            if not entry.is_file():
+                continue
+            base, ext = os.path.splitext(entry.name)
+            parts = base.split('_')
+            if len(parts) < 2:
+                continue
+            entries.append((entry.path, parts[0], parts[-1], ext))
+    return tuple(entries)
+
+
+def scan_files(folder, suffixes=None, timeframes=None):
+    """Return [(path, ticker, timeframe)] for the data files in folder.
+
+    suffixes and timeframes optionally restrict the extensions (e.g.
+    {'.parquet'}) and timeframe tokens (e.g. {'1d'}) that are returned.
+    """
+    entries = [
+        e for e in _scan_cached(folder, os.path.getmtime(folder))
+        if (suffixes is None or e[3] in suffixes)
+        and (timeframes is None or e[2] in timeframes)
+    ]
+    # The migration shims rewrite legacy CSVs as Parquet/Arrow without
+    # deleting them; when both survive, only the migrated copy counts,
+    # otherwise every consumer would ingest the same store twice
+    migrated = {(ticker, timeframe)
+                for _, ticker, timeframe, ext in entries if ext != '.csv'}
+    return [
+        (path, ticker, timeframe)
+        for path, ticker, timeframe, ext in entries
+        if ext != '.csv' or (ticker, timeframe) not in migrated
+    ]